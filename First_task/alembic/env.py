@@ -7,6 +7,10 @@ from alembic import context
 
 import os
 import sys
+from dotenv import load_dotenv
+
+# настройки приложения (NOTE_COMPRESSION и т.д.) читаются из .env, как в database.py
+load_dotenv()
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 from First_task.models import SQLModel
@@ -0,0 +1,100 @@
+"""compress note content
+
+Revision ID: b7e2c41d9a53
+Revises: 3ea075b9cc76
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+import os
+import zlib
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e2c41d9a53'
+down_revision: Union[str, None] = '3ea075b9cc76'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 500
+
+note = sa.table(
+    'note',
+    sa.column('id', sa.Integer),
+    sa.column('content', sa.String),
+    sa.column('content_compressed', sa.LargeBinary),
+    sa.column('content_encoding', sa.String),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('note') as batch_op:
+        batch_op.add_column(sa.Column('content_compressed', sa.LargeBinary(), nullable=True))
+        batch_op.add_column(sa.Column('content_encoding', sa.String(), nullable=True))
+        batch_op.alter_column('content', existing_type=sa.String(), nullable=True)
+
+    # бэкфилл только если сжатие включено; миграция пишет zlib, zstd появится у новых записей
+    if not os.getenv('NOTE_COMPRESSION') or context.is_offline_mode():
+        return
+    threshold = int(os.getenv('NOTE_COMPRESSION_THRESHOLD', '4096'))
+    bind = op.get_bind()
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(note.c.id, note.c.content)
+            .where(note.c.id > last_id, note.c.content_encoding.is_(None))
+            .order_by(note.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        for row_id, content in rows:
+            raw = (content or '').encode('utf-8')
+            if len(raw) < threshold:
+                continue
+            compressed = zlib.compress(raw, 6)
+            if len(compressed) >= len(raw):
+                continue
+            bind.execute(
+                note.update()
+                .where(note.c.id == row_id)
+                .values(content=None, content_compressed=compressed, content_encoding='zlib')
+            )
+        last_id = rows[-1][0]
+
+
+def _decompress(data: bytes, encoding: str) -> str:
+    if encoding == 'zstd':
+        import zstandard
+        return zstandard.ZstdDecompressor().decompress(data).decode('utf-8')
+    return zlib.decompress(data).decode('utf-8')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(note.c.id, note.c.content_compressed, note.c.content_encoding)
+            .where(note.c.id > last_id, note.c.content_encoding.is_not(None))
+            .order_by(note.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        for row_id, compressed, encoding in rows:
+            bind.execute(
+                note.update()
+                .where(note.c.id == row_id)
+                .values(content=_decompress(compressed, encoding))
+            )
+        last_id = rows[-1][0]
+    with op.batch_alter_table('note') as batch_op:
+        batch_op.alter_column('content', existing_type=sa.String(), nullable=False)
+        batch_op.drop_column('content_encoding')
+        batch_op.drop_column('content_compressed')
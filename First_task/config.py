@@ -1,3 +1,5 @@
+from typing import Literal, Optional
+from pydantic import field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
@@ -9,8 +11,21 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
 
+    NOTE_COMPRESSION: Optional[Literal["zlib", "zstd"]] = None
+    NOTE_COMPRESSION_THRESHOLD: int = 4096
+
     DEBUG: bool = False
     CELERY_BROKER_URL: str = "redis://redis:6379/0"
     CELERY_RESULT_BACKEND: str = "redis://redis:6379/0"
 
+    @field_validator("NOTE_COMPRESSION")
+    @classmethod
+    def check_compression_backend(cls, value):
+        if value == "zstd":
+            try:
+                import zstandard  # noqa: F401
+            except ImportError:
+                raise ValueError("NOTE_COMPRESSION=zstd requires the zstandard package")
+        return value
+
 settings = Settings()
\ No newline at end of file
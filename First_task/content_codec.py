@@ -0,0 +1,51 @@
+import zlib
+from config import settings
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def _compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "zlib":
+        return zlib.compress(data, 6)
+    if encoding == "zstd":
+        if zstandard is None:
+            raise RuntimeError("NOTE_COMPRESSION=zstd requires the zstandard package")
+        return zstandard.ZstdCompressor().compress(data)
+    raise ValueError(f"Unknown note compression: {encoding}")
+
+
+def _decompress(data: bytes, encoding: str) -> bytes:
+    if encoding == "zlib":
+        return zlib.decompress(data)
+    if encoding == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Reading zstd notes requires the zstandard package")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"Unknown note compression: {encoding}")
+
+
+def pack_content(text: str) -> dict:
+    """Возвращает значения колонок заметки: сжатые, если включено и текст больше порога"""
+    encoding = settings.NOTE_COMPRESSION
+    raw = text.encode("utf-8")
+    if encoding and len(raw) >= settings.NOTE_COMPRESSION_THRESHOLD:
+        compressed = _compress(raw, encoding)
+        if len(compressed) < len(raw):
+            return {"content": None, "content_compressed": compressed, "content_encoding": encoding}
+    return {"content": text, "content_compressed": None, "content_encoding": None}
+
+
+def unpack_content(note) -> str:
+    if not note.content_encoding:
+        return note.content
+    return _decompress(note.content_compressed, note.content_encoding).decode("utf-8")
+
+
+def unpacked_values(note, fields, content=None) -> dict:
+    """Значения полей заметки с текстом в открытом виде; content передают, если он уже распакован"""
+    values = {name: getattr(note, name) for name in fields}
+    values["content"] = unpack_content(note) if content is None else content
+    return values
@@ -1,7 +1,7 @@
 from config import settings
 import redis.asyncio as aioredis
-from middleware import RateLimiterMiddleware
-from redis_cache import redis_client
+from middleware import RateLimiterMiddleware, ConcurrencyLimiterMiddleware
+from redis_cache import RedisBatcher, get_redis_batcher
 from ws_manager import ConnectionManager 
 from fastapi import FastAPI, Depends, HTTPException, status, Form, Path, Query, BackgroundTasks, WebSocket, WebSocketDisconnect, Request, Body
 from celery_app import send_email_task
@@ -12,9 +12,11 @@ from models import User, UserCreate, UserLogin, UserOut
 from security import get_password_hash, verify_password, create_access_token, ALGORITHM, get_current_user
 from models import Note, NoteCreate, NoteUpdate, NoteOut
 from database import get_session, init_db
+from content_codec import pack_content, unpack_content, unpacked_values
 from dotenv import load_dotenv
 from datetime import datetime
 from prometheus_fastapi_instrumentator import Instrumentator
+import asyncio
 import logging
 import sys
 import json 
@@ -28,21 +30,31 @@ Instrumentator().instrument(app).expose(app)
 load_dotenv()
 manager = ConnectionManager()
 
+# добавленный последним middleware внешний: 429 отсекаются до очереди лимитера
+app.add_middleware(
+    ConcurrencyLimiterMiddleware,
+    limits={("GET", "/notes/"): 20, ("POST", "/login/"): 8},
+    max_queue=50,
+    queue_timeout=2.0,
+    retry_after=1,
+    adaptive=True,
+)
+
 app.add_middleware(
     RateLimiterMiddleware,
-    get_redis=lambda: getattr(app.state, "redis", None),
+    get_redis=lambda: getattr(app.state, "redis_batcher", None),
     limit=5,
     window=60
 )
 
 @app.get("/notes")
-async def get_notes():
+async def get_notes(cache: RedisBatcher = Depends(get_redis_batcher)):
     cache_key = "notes:all"
-    cached = await redis_client.get(cache_key)
+    cached = await cache.get(cache_key)
     if cached:
         return json.loads(cached)
     notes = await get_notes_from_db()
-    await redis_client.set(cache_key, json.dumps(notes), ex=60)
+    await cache.set(cache_key, json.dumps(notes), ex=60)
     return notes
 
 @app.websocket("/ws")
@@ -100,11 +112,12 @@ async def create_note(
         }
     ),
     session: AsyncSession = Depends(get_session),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    cache: RedisBatcher = Depends(get_redis_batcher)
 ) -> NoteOut:
-    db_note = Note(**note.dict(), owner_id=current_user.id)
+    db_note = Note(title=note.title, **pack_content(note.content), owner_id=current_user.id)
     session.add(db_note)
-    await redis_client.delete("notes:all")
+    await cache.delete("notes:all")
     await session.commit()
     await session.refresh(db_note)
     return db_note
@@ -118,6 +131,7 @@ def send_email(email: str):
 async def on_startup():
     await init_db()
     app.state.redis = await aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+    app.state.redis_batcher = RedisBatcher(app.state.redis)
 
 @app.on_event("shutdown")
 async def on_shutdown():
@@ -144,16 +158,21 @@ async def update_note(
     note_update: NoteUpdate,
     note_id: int = Path(..., gt=0),
     session: AsyncSession = Depends(get_session),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    cache: RedisBatcher = Depends(get_redis_batcher)
 ):
     note = await session.get(Note, note_id)
     if not note or note.owner_id != current_user.id:
         raise HTTPException(status_code=404, detail="Note not found")
     for key, value in note_update.dict(exclude_unset=True).items():
-        setattr(note, key, value)
+        if key == "content":
+            for column, packed in pack_content(value).items():
+                setattr(note, column, packed)
+        else:
+            setattr(note, key, value)
     note.updated_at = datetime.utcnow()
     session.add(note)
-    await redis_client.delete(f"note:{note_id}")
+    await cache.delete(f"note:{note_id}")
     await session.commit()
     await session.refresh(note)
     return note
@@ -162,12 +181,13 @@ async def update_note(
 async def delete_note(
     note_id: int = Path(..., gt=0),
     session: AsyncSession = Depends(get_session),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    cache: RedisBatcher = Depends(get_redis_batcher)
 ):
     note = await session.get(Note, note_id)
     if not note or note.owner_id != current_user.id:
         raise HTTPException(status_code=404, detail="Note not found")
-    await redis_client.delete(f"note:{note_id}")
+    await cache.delete(f"note:{note_id}")
     await session.delete(note)
     await session.commit()
 
@@ -175,11 +195,12 @@ async def delete_note(
 async def create_note(
     note: NoteCreate,
     session: AsyncSession = Depends(get_session),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    cache: RedisBatcher = Depends(get_redis_batcher)
 ) -> NoteOut:
-    db_note = Note(**note.dict(), owner_id=current_user.id)
+    db_note = Note(title=note.title, **pack_content(note.content), owner_id=current_user.id)
     session.add(db_note)
-    await redis_client.delete("notes:all")
+    await cache.delete("notes:all")
     await session.commit()
     await session.refresh(db_note)
     return db_note
@@ -192,13 +213,39 @@ async def read_notes(
     session: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ) -> List[NoteOut]:
-    statement = select(Note).where(Note.owner_id == current_user.id).offset(skip).limit(limit)
+    statement = select(Note).where(Note.owner_id == current_user.id)
     if search:
+        # % и _ ищем буквально, как и в распакованном тексте ниже
+        escaped = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        pattern = f"%{escaped}%"
+        # сжатый текст нельзя искать в БД: такие заметки проверяем после распаковки,
+        # читая по id и останавливаясь, как только набрали skip + limit совпадений
         statement = statement.where(
-            (Note.title.ilike(f"%{search}%")) | (Note.content.ilike(f"%{search}%"))
-        )
-    result = await session.execute(statement)
-    statement = statement.offset(skip).limit(limit)
+            (Note.title.ilike(pattern, escape="\\"))
+            | (Note.content.ilike(pattern, escape="\\"))
+            | (Note.content_encoding.is_not(None))
+        ).order_by(Note.id)
+        needle = search.lower()
+        notes = []
+        matched = 0
+        result = await session.stream_scalars(statement)
+        try:
+            async for note in result:
+                if note.content_encoding and needle not in note.title.lower():
+                    content = await asyncio.to_thread(unpack_content, note)
+                    if needle not in content.lower():
+                        continue
+                    # отдаём уже распакованный текст, чтобы NoteOut не распаковывал заново
+                    note = NoteOut.model_validate(unpacked_values(note, NoteOut.model_fields, content))
+                matched += 1
+                if matched > skip:
+                    notes.append(note)
+                    if len(notes) == limit:
+                        break
+        finally:
+            await result.close()
+        return notes
+    result = await session.execute(statement.offset(skip).limit(limit))
     notes = result.scalars().all()
     return notes
 
@@ -1,7 +1,22 @@
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import JSONResponse
+from prometheus_client import Counter, Gauge
+from collections import deque
+from redis_cache import RedisBatcher
+import asyncio
 import time
 
+
+async def incr_with_ttl(redis, key, seconds):
+    # INCR строго до EXPIRE NX, иначе счётчик может остаться без TTL
+    if isinstance(redis, RedisBatcher):
+        return await redis.incr_with_ttl(key, seconds)
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.incr(key)
+        pipe.expire(key, seconds, nx=True)
+        count, _ = await pipe.execute()
+    return count
+
 class RateLimiterMiddleware(BaseHTTPMiddleware):
     def __init__(self, app, get_redis, limit=5, window=60):
         super().__init__(app)
@@ -20,13 +35,7 @@ class RateLimiterMiddleware(BaseHTTPMiddleware):
         window_start = now - (now % self.window)
         redis_key = f"{key}:{window_start}"
 
-        count = await redis.get(redis_key)
-        if count is None:
-            await redis.set(redis_key, 1, ex=self.window)
-            count = 1
-        else:
-            count = int(count) + 1
-            await redis.set(redis_key, count, ex=self.window)
+        count = int(await incr_with_ttl(redis, redis_key, self.window))
 
         if count > self.limit:
             return JSONResponse(
@@ -34,4 +43,142 @@ class RateLimiterMiddleware(BaseHTTPMiddleware):
                 content={"detail": "Rate limit exceeded. Try again later."}
             )
 
-        return await call_next(request)
\ No newline at end of file
+        return await call_next(request)
+
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "Requests currently being processed",
+    ["route"],
+)
+REQUESTS_QUEUED = Gauge(
+    "http_requests_queued",
+    "Requests waiting for a concurrency slot",
+    ["route"],
+)
+REQUESTS_SHED = Counter(
+    "http_requests_shed_total",
+    "Requests rejected by the concurrency limiter",
+    ["route", "reason"],
+)
+CONCURRENCY_LIMIT = Gauge(
+    "http_concurrency_limit",
+    "Current concurrency limit",
+    ["route"],
+)
+
+
+class RouteLimiter:
+    """Ограничение одновременных запросов к маршруту с очередью и AIMD-подстройкой"""
+
+    def __init__(self, route, limit, max_queue=0, queue_timeout=1.0,
+                 adaptive=False, min_limit=1, max_limit=None,
+                 target_latency=0.5, backoff=0.9):
+        self.route = route
+        self.limit = float(limit)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.adaptive = adaptive
+        self.min_limit = min_limit
+        self.max_limit = max_limit if max_limit is not None else limit * 4
+        self.target_latency = target_latency
+        self.backoff = backoff
+        self.in_flight = 0
+        self.shed = 0
+        self._last_decrease = 0.0
+        self._waiters = deque()
+        CONCURRENCY_LIMIT.labels(route).set(self.limit)
+
+    def _has_capacity(self):
+        return self.in_flight < int(self.limit)
+
+    def _reject(self, reason):
+        self.shed += 1
+        REQUESTS_SHED.labels(self.route, reason).inc()
+        return False
+
+    async def acquire(self):
+        if self._has_capacity() and not self._waiters:
+            self._take()
+            return True
+        if len(self._waiters) >= self.max_queue:
+            return self._reject("queue_full")
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        REQUESTS_QUEUED.labels(self.route).inc()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+            return True
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # слот выдали одновременно с таймаутом
+                return True
+            self._waiters.remove(waiter)
+            return self._reject("queue_timeout")
+        except asyncio.CancelledError:
+            if waiter.done():
+                self.release()
+            else:
+                self._waiters.remove(waiter)
+            raise
+        finally:
+            REQUESTS_QUEUED.labels(self.route).dec()
+
+    def _take(self):
+        self.in_flight += 1
+        REQUESTS_IN_FLIGHT.labels(self.route).inc()
+
+    def release(self, latency=None):
+        self.in_flight -= 1
+        REQUESTS_IN_FLIGHT.labels(self.route).dec()
+        if self.adaptive and latency is not None:
+            if latency > self.target_latency:
+                # один всплеск медленных ответов снижает лимит только один раз
+                now = time.monotonic()
+                if now - self._last_decrease >= self.target_latency:
+                    self._last_decrease = now
+                    self.limit = max(self.min_limit, self.limit * self.backoff)
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            CONCURRENCY_LIMIT.labels(self.route).set(self.limit)
+        while self._waiters and self._has_capacity():
+            self._take()
+            self._waiters.popleft().set_result(None)
+
+
+class ConcurrencyLimiterMiddleware(BaseHTTPMiddleware):
+    def __init__(self, app, limits, max_queue=0, queue_timeout=1.0,
+                 retry_after=1, adaptive=False, **adaptive_options):
+        super().__init__(app)
+        self.retry_after = retry_after
+        # ключ (метод, путь): чтение и запись одного пути ограничиваются отдельно
+        self.limiters = {
+            (method, path): RouteLimiter(f"{method} {path}", limit, max_queue, queue_timeout,
+                                         adaptive=adaptive, **adaptive_options)
+            for (method, path), limit in limits.items()
+        }
+
+    async def dispatch(self, request, call_next):
+        limiter = self.limiters.get((request.method, request.url.path))
+        if limiter is None:
+            return await call_next(request)
+
+        if not await limiter.acquire():
+            return JSONResponse(
+                status_code=503,
+                content={"detail": "Server is busy. Try again later."},
+                headers={"Retry-After": str(self.retry_after)},
+            )
+
+        started = time.perf_counter()
+        # упавший обработчик считаем сигналом перегрузки
+        latency = float("inf")
+        try:
+            response = await call_next(request)
+            # быстрые ошибки клиента (401, 404, 429) не говорят о нагрузке, а 5xx говорят
+            if 400 <= response.status_code < 500:
+                latency = None
+            else:
+                latency = time.perf_counter() - started
+            return response
+        finally:
+            limiter.release(latency)
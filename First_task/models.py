@@ -2,7 +2,8 @@ from config import settings
 from sqlmodel import SQLModel, Field as ORMField, Relationship
 from datetime import datetime
 from typing import Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
+from content_codec import unpacked_values
 
 
 class User(SQLModel, table=True):
@@ -20,7 +21,9 @@ class User(SQLModel, table=True):
 class Note(SQLModel, table=True):
     id: Optional[int] = ORMField(default=None, primary_key=True)
     title: str
-    content: str
+    content: Optional[str] = ORMField(default=None)
+    content_compressed: Optional[bytes] = ORMField(default=None)
+    content_encoding: Optional[str] = ORMField(default=None)
     owner_id: int = ORMField(foreign_key="user.id")
     created_at: datetime = ORMField(default_factory=datetime.utcnow)
     updated_at: datetime = ORMField(default_factory=datetime.utcnow)
@@ -70,4 +73,12 @@ class NoteOut(BaseModel):
     updated_at: datetime
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+    @model_validator(mode="before")
+    @classmethod
+    def decompress_content(cls, data):
+        # распаковываем только при сериализации ответа
+        if getattr(data, "content_encoding", None):
+            return unpacked_values(data, cls.model_fields)
+        return data
\ No newline at end of file
@@ -1,4 +1,115 @@
-import redis.asyncio as redis
-from config import settings
+import asyncio
+import time
+from fastapi import Request
+from prometheus_client import Counter, Histogram
 
-redis_client = redis.from_url("redis://localhost:6379", decode_responses=True)
\ No newline at end of file
+REDIS_BATCH_SIZE = Histogram(
+    "redis_batch_size",
+    "Number of commands sent to Redis in one pipeline",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+REDIS_BATCH_LATENCY = Histogram(
+    "redis_batch_latency_seconds",
+    "Round trip time of one Redis pipeline",
+)
+REDIS_DEDUPLICATED_GETS = Counter(
+    "redis_deduplicated_gets_total",
+    "GET commands served by an identical in-flight GET",
+)
+
+
+class RedisBatcher:
+    """Собирает команды одного тика event loop в один pipeline (как DataLoader)"""
+
+    def __init__(self, client):
+        self.client = client
+        self._pending = []
+        self._inflight_gets = {}
+        self._flush_scheduled = False
+        self._flush_task = None
+        self.batches_sent = 0
+        self.commands_sent = 0
+        self.gets_deduplicated = 0
+
+    def _enqueue(self, command, args, kwargs):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((command, args, kwargs, future))
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            self._flush_task = loop.create_task(self._flush())
+        return future
+
+    async def _flush(self):
+        batch, self._pending = self._pending, []
+        self._flush_scheduled = False
+        if not batch:
+            return
+        started = time.perf_counter()
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for command, args, kwargs, _ in batch:
+                    getattr(pipe, command)(*args, **kwargs)
+                results = await pipe.execute(raise_on_error=False)
+        except Exception as exc:
+            results = [exc] * len(batch)
+        REDIS_BATCH_LATENCY.observe(time.perf_counter() - started)
+        REDIS_BATCH_SIZE.observe(len(batch))
+        self.batches_sent += 1
+        self.commands_sent += len(batch)
+        for (_, _, _, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def execute(self, command, *args, **kwargs):
+        # неизвестно, какие ключи меняет команда, поэтому последующие GET не склеиваем с уже отправленными
+        self._inflight_gets.clear()
+        return await self._enqueue(command, args, kwargs)
+
+    async def _write(self, keys, command, *args, **kwargs):
+        # запись меняет только свои ключи, GET остальных ключей по-прежнему склеиваются
+        for key in keys:
+            self._inflight_gets.pop(key, None)
+        return await self._enqueue(command, args, kwargs)
+
+    async def get(self, key):
+        future = self._inflight_gets.get(key)
+        if future is not None:
+            self.gets_deduplicated += 1
+            REDIS_DEDUPLICATED_GETS.inc()
+            return await asyncio.shield(future)
+        future = self._enqueue("get", (key,), {})
+        self._inflight_gets[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if self._inflight_gets.get(key) is future:
+                del self._inflight_gets[key]
+
+    async def set(self, key, value, **kwargs):
+        return await self._write((key,), "set", key, value, **kwargs)
+
+    async def delete(self, *keys):
+        return await self._write(keys, "delete", *keys)
+
+    async def incr(self, key, amount=1):
+        return await self._write((key,), "incr", key, amount)
+
+    async def expire(self, key, seconds, **kwargs):
+        return await self._write((key,), "expire", key, seconds, **kwargs)
+
+    async def incr_with_ttl(self, key, seconds):
+        """INCR и EXPIRE NX ставятся в очередь подряд и гарантированно уходят одним pipeline"""
+        self._inflight_gets.pop(key, None)
+        count = self._enqueue("incr", (key, 1), {})
+        ttl = self._enqueue("expire", (key, seconds), {"nx": True})
+        count, _ = await asyncio.gather(count, ttl)
+        return count
+
+
+def get_redis_batcher(request: Request) -> RedisBatcher:
+    return request.app.state.redis_batcher
@@ -4,11 +4,15 @@ import os
 import pytest
 import pytest_asyncio
 from httpx import AsyncClient, ASGITransport
+import fakeredis
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from sqlmodel import SQLModel
 from main import app, get_session
+from redis_cache import RedisBatcher, get_redis_batcher
 import database
+from models import Note
+from config import settings
 
 DATABASE_URL = "sqlite+aiosqlite:///:memory:"
 
@@ -28,6 +32,13 @@ async def override_db():
     yield
     await test_engine.dispose()
 
+@pytest.fixture(scope="function", autouse=True)
+def override_redis():
+    batcher = RedisBatcher(fakeredis.FakeAsyncRedis(decode_responses=True))
+    app.dependency_overrides[get_redis_batcher] = lambda: batcher
+    yield
+    app.dependency_overrides.pop(get_redis_batcher, None)
+
 @pytest_asyncio.fixture(scope="function")
 async def async_client():
     transport = ASGITransport(app=app)
@@ -70,4 +81,48 @@ async def test_notes_crud(async_client):
     resp = await async_client.delete(f"/notes/{note_id}", headers=headers)
     assert resp.status_code == 204
     resp = await async_client.get(f"/notes/{note_id}", headers=headers)
-    assert resp.status_code == 404
\ No newline at end of file
+    assert resp.status_code == 404
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("encoding", ["zlib", "zstd"])
+async def test_large_note_content_compressed(async_client, monkeypatch, encoding):
+    monkeypatch.setattr(settings, "NOTE_COMPRESSION", encoding)
+    monkeypatch.setattr(settings, "NOTE_COMPRESSION_THRESHOLD", 100)
+    await async_client.post("/register/", json={"username": "user4", "password": "pass"})
+    resp = await async_client.post("/login/", data={"username": "user4", "password": "pass"})
+    headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+    content = "needle " + "lorem ipsum " * 200
+    resp = await async_client.post("/notes/", json={"title": "big", "content": content}, headers=headers)
+    assert resp.status_code == 200
+    assert resp.json()["content"] == content
+    note_id = resp.json()["id"]
+    async with database.async_session_maker() as session:
+        note = await session.get(Note, note_id)
+        assert note.content is None
+        assert note.content_encoding == encoding
+        assert len(note.content_compressed) < len(content)
+    resp = await async_client.get(f"/notes/{note_id}", headers=headers)
+    assert resp.json()["content"] == content
+    resp = await async_client.get("/notes/", params={"search": "NEEDLE"}, headers=headers)
+    assert [n["id"] for n in resp.json()] == [note_id]
+    resp = await async_client.get("/notes/", params={"search": "missing"}, headers=headers)
+    assert resp.json() == []
+
+@pytest.mark.asyncio
+async def test_search_pages_mixed_notes_literally(async_client, monkeypatch):
+    monkeypatch.setattr(settings, "NOTE_COMPRESSION", "zlib")
+    monkeypatch.setattr(settings, "NOTE_COMPRESSION_THRESHOLD", 100)
+    await async_client.post("/register/", json={"username": "user5", "password": "pass"})
+    resp = await async_client.post("/login/", data={"username": "user5", "password": "pass"})
+    headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+    ids = []
+    for content in ["100% short", "x" * 50, "100% long " + "lorem ipsum " * 50, "100% tail"]:
+        resp = await async_client.post("/notes/", json={"title": "t", "content": content}, headers=headers)
+        ids.append(resp.json()["id"])
+    resp = await async_client.get("/notes/", params={"search": "0%"}, headers=headers)
+    assert [n["id"] for n in resp.json()] == [ids[0], ids[2], ids[3]]
+    resp = await async_client.get("/notes/", params={"search": "0%", "skip": 1, "limit": 1}, headers=headers)
+    assert [n["id"] for n in resp.json()] == [ids[2]]
+    assert resp.json()[0]["content"].startswith("100% long")
+    resp = await async_client.get("/notes/", params={"search": "x_"}, headers=headers)
+    assert resp.json() == []
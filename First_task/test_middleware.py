@@ -0,0 +1,140 @@
+import asyncio
+import pytest
+from fastapi import FastAPI, HTTPException
+from httpx import AsyncClient, ASGITransport
+import fakeredis
+from middleware import ConcurrencyLimiterMiddleware, RateLimiterMiddleware, RouteLimiter
+
+
+def make_app(limit=1, **options):
+    app = FastAPI()
+    app.state.release = asyncio.Event()
+    app.add_middleware(ConcurrencyLimiterMiddleware, limits={("GET", "/slow"): limit}, **options)
+
+    @app.get("/slow")
+    async def slow(fail: int = 0, delay: float = 0):
+        await app.state.release.wait()
+        await asyncio.sleep(delay)
+        if fail == -1:
+            raise RuntimeError("handler crashed")
+        if fail:
+            raise HTTPException(status_code=fail)
+        return {"status": "ok"}
+
+    @app.get("/fast")
+    async def fast():
+        return {"status": "ok"}
+
+    @app.post("/slow")
+    async def write():
+        return {"status": "ok"}
+
+    return app
+
+
+@pytest.mark.asyncio
+async def test_sheds_when_queue_full():
+    app = make_app(max_queue=0, retry_after=3)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        first = asyncio.create_task(ac.get("/slow"))
+        await asyncio.sleep(0.05)
+        resp = await ac.get("/slow")
+        assert resp.status_code == 503
+        assert resp.headers["Retry-After"] == "3"
+        resp = await ac.get("/fast")
+        assert resp.status_code == 200
+        resp = await ac.post("/slow")
+        assert resp.status_code == 200
+        app.state.release.set()
+        assert (await first).status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_queued_request_times_out_then_runs():
+    app = make_app(max_queue=1, queue_timeout=0.05)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        first = asyncio.create_task(ac.get("/slow"))
+        await asyncio.sleep(0.05)
+        resp = await ac.get("/slow")
+        assert resp.status_code == 503
+
+        second = asyncio.create_task(ac.get("/slow"))
+        await asyncio.sleep(0.01)
+        app.state.release.set()
+        assert (await first).status_code == 200
+        assert (await second).status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_adaptive_limit_follows_latency():
+    limiter = RouteLimiter("/aimd", 10, adaptive=True, target_latency=0.1, backoff=0.5)
+    assert await limiter.acquire()
+    limiter.release(latency=1.0)
+    assert limiter.limit == 5
+    assert await limiter.acquire()
+    limiter.release(latency=0.01)
+    assert limiter.limit == 5.2
+
+
+@pytest.mark.asyncio
+async def test_adaptive_limit_decreases_once_per_burst():
+    limiter = RouteLimiter("/burst", 20, adaptive=True, target_latency=10, backoff=0.5)
+    for _ in range(5):
+        assert await limiter.acquire()
+    for _ in range(5):
+        limiter.release(latency=20)
+    assert limiter.limit == 10
+
+
+@pytest.fixture
+def limiters(monkeypatch):
+    created = []
+    init = RouteLimiter.__init__
+
+    def record(self, *args, **kwargs):
+        init(self, *args, **kwargs)
+        created.append(self)
+
+    monkeypatch.setattr(RouteLimiter, "__init__", record)
+    return created
+
+
+@pytest.mark.asyncio
+async def test_client_errors_do_not_tune_limit(limiters):
+    app = make_app(limit=4, adaptive=True, target_latency=0.01, backoff=0.5)
+    app.state.release.set()
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        resp = await ac.get("/slow", params={"fail": 404, "delay": 0.05})
+        assert resp.status_code == 404
+    assert limiters[0].limit == 4
+
+
+@pytest.mark.asyncio
+async def test_slow_server_errors_decrease_limit(limiters):
+    app = make_app(limit=4, adaptive=True, target_latency=0.01, backoff=0.5)
+    app.state.release.set()
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        resp = await ac.get("/slow", params={"fail": 500, "delay": 0.05})
+        assert resp.status_code == 500
+        [limiter] = limiters
+        assert limiter.limit == 2
+        await asyncio.sleep(0.02)
+        with pytest.raises(RuntimeError):
+            await ac.get("/slow", params={"fail": -1})
+        assert limiter.limit == 1
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_with_plain_client_sets_ttl():
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    app = FastAPI()
+    app.add_middleware(RateLimiterMiddleware, get_redis=lambda: redis, limit=2, window=60)
+
+    @app.get("/fast")
+    async def fast():
+        return {"status": "ok"}
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        assert [(await ac.get("/fast")).status_code for _ in range(3)] == [200, 200, 429]
+    [key] = await redis.keys("rl:*")
+    assert 0 < await redis.ttl(key) <= 60
@@ -0,0 +1,77 @@
+import asyncio
+import fakeredis
+import pytest
+from redis_cache import RedisBatcher
+
+
+@pytest.fixture
+def batcher():
+    return RedisBatcher(fakeredis.FakeAsyncRedis(decode_responses=True))
+
+
+@pytest.mark.asyncio
+async def test_commands_in_same_tick_share_pipeline(batcher):
+    await asyncio.gather(
+        batcher.set("a", "1"),
+        batcher.set("b", "2"),
+        batcher.delete("c"),
+    )
+    assert batcher.batches_sent == 1
+    assert batcher.commands_sent == 3
+    assert await batcher.get("a") == "1"
+    assert batcher.batches_sent == 2
+
+
+@pytest.mark.asyncio
+async def test_concurrent_gets_are_deduplicated(batcher):
+    await batcher.set("k", "v")
+    results = await asyncio.gather(*(batcher.get("k") for _ in range(10)))
+    assert results == ["v"] * 10
+    assert batcher.gets_deduplicated == 9
+    assert batcher.commands_sent == 2
+
+
+@pytest.mark.asyncio
+async def test_get_after_write_is_not_deduplicated(batcher):
+    await batcher.set("k", "old")
+    first, _, second = await asyncio.gather(
+        batcher.get("k"),
+        batcher.set("k", "new"),
+        batcher.get("k"),
+    )
+    assert first == "old"
+    assert second == "new"
+    assert batcher.gets_deduplicated == 0
+
+
+@pytest.mark.asyncio
+async def test_write_to_other_key_keeps_get_shared(batcher):
+    await batcher.set("notes:all", "cached")
+    first, _, second = await asyncio.gather(
+        batcher.get("notes:all"),
+        batcher.incr("rl:127.0.0.1:0"),
+        batcher.get("notes:all"),
+    )
+    assert first == second == "cached"
+    assert batcher.gets_deduplicated == 1
+
+
+@pytest.mark.asyncio
+async def test_command_error_is_raised_to_caller_only(batcher):
+    await batcher.set("s", "text")
+    ok, failed = await asyncio.gather(
+        batcher.set("x", "1"),
+        batcher.incr("s"),
+        return_exceptions=True,
+    )
+    assert ok is True
+    assert isinstance(failed, Exception)
+
+
+@pytest.mark.asyncio
+async def test_incr_with_ttl_sets_expiry_once(batcher):
+    assert await batcher.incr_with_ttl("rl", 60) == 1
+    await batcher.expire("rl", 5)
+    assert await batcher.incr_with_ttl("rl", 60) == 2
+    assert 0 < await batcher.client.ttl("rl") <= 5
+    assert batcher.batches_sent == 3